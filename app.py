@@ -1,100 +1,237 @@
 import asyncio
 import json 
-from fastapi import FastAPI, HTTPException
+import zlib
+import orjson
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
+from crawl4ai import AsyncWebCrawler
 
+from cache import content_digest, make_summary_cache, normalize_url
 from crawler import WebCrawler
-from summarizer import ContentSummarizer 
+from summarizer import get_summarizer
 
-async def process_url_and_summarize(target_url: str):
+# Shared across requests; the browser behind it is started once in the app lifespan.
+crawler = WebCrawler(max_depth=0, max_pages=1, verbose=False)
+summary_cache = make_summary_cache()
+# Pages below either threshold are answered with an empty summary without calling Gemini
+MIN_MARKDOWN_CHARS = 500
+# zlib-compressed size / raw size; prose and docs pages land around 0.2-0.5, a block of
+# repeated nav or cookie lines under 0.05
+MIN_MARKDOWN_COMPRESSION_RATIO = 0.1
+# Caps crawls + Gemini calls running at once so bursts don't trip Gemini rate limits
+SUMMARY_SEM = asyncio.Semaphore(8)
+# Pipelines currently running, keyed by normalized URL, so concurrent duplicates share one result
+_inflight: dict[str, asyncio.Future] = {}
+
+def _is_low_content(markdown_text: str) -> bool:
+    """
+    Cheap check for pages not worth a Gemini call: too short, or compressing so well
+    that it is almost certainly the same boilerplate repeated.
+    """
+    text = markdown_text.strip()
+    if len(text) < MIN_MARKDOWN_CHARS:
+        return True
+    raw = text.encode("utf-8")
+    # Level 1 is a few ms even for the largest pages and ranks repetition just as well
+    return len(zlib.compress(raw, 1)) < len(raw) * MIN_MARKDOWN_COMPRESSION_RATIO
+
+async def process_url_and_summarize(target_url: str, crawler_context: AsyncWebCrawler = None, on_module=None):
     """
     Crawls a URL and generates a structured JSON summary.
     Returns a dictionary with status and data/error message.
+    Concurrent calls for the same URL wait on the first one instead of crawling again.
+    on_module is passed on to _crawl_and_summarize when this call runs the pipeline itself;
+    calls that wait on another one only get the finished result.
     """
-    crawler = WebCrawler(max_depth=0, max_pages=1, verbose=False)
-    
-    crawl_results = []
     try:
-        if not target_url or not target_url.strip():
-            return {"status": "error", "source": "input_validation", "message": "Target URL cannot be empty."}
-        crawl_results = await crawler.crawl(target_url)
+        key = normalize_url(target_url or "")
+    except ValueError:
+        return {"status": "error", "source": "input_validation", "message": f"Invalid URL format: {target_url}"}
+    pending = _inflight.get(key)
+    while pending is not None:
+        try:
+            # shield so a cancelled duplicate doesn't cancel the shared future
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise # this request itself was cancelled
+            # Only the leading request was cancelled; run the pipeline here instead,
+            # or wait on whichever duplicate already took over
+            pending = _inflight.get(key)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await _crawl_and_summarize(target_url, crawler_context, on_module)
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
     except Exception as e:
-        print(f"Error during crawling {target_url}: {e}")
-        return {"status": "error", "source": "crawler", "message": f"Crawling failed for {target_url}. Error: {str(e)}"}
+        future.set_exception(e)
+        future.exception() # mark as retrieved when nobody else is waiting
+        raise
+    finally:
+        _inflight.pop(key, None)
 
-    if not crawl_results:
-        return {"status": "error", "source": "crawler", "message": f"No content retrieved from crawling {target_url}. The URL might be invalid, inaccessible, or have no scrapable content."}
+async def _crawl_and_summarize(target_url: str, crawler_context: AsyncWebCrawler = None, on_module=None):
+    """
+    Runs the cache lookup, crawl and summary steps for a single URL and returns the result dictionary.
+    If on_module is given it is called with each module as soon as Gemini has produced it;
+    results served from the cache or skipped pages don't trigger it.
+    """
+    if not target_url or not target_url.strip():
+        return {"status": "error", "source": "input_validation", "message": "Target URL cannot be empty."}
 
-    page_to_summarize = crawl_results[0]
+    cached = await summary_cache.get_by_url(target_url)
+    if cached is not None:
+        return {**cached["summary_json"], "cache": "hit"}
 
-    if not (hasattr(page_to_summarize, 'markdown') and \
-            hasattr(page_to_summarize.markdown, 'raw_markdown') and \
-            page_to_summarize.markdown.raw_markdown and \
-            page_to_summarize.markdown.raw_markdown.strip()): # Check if markdown is not just whitespace
-        return {"status": "error", "source": "crawler", "message": "Crawled page has no meaningful markdown content to summarize."}
-        
-    markdown_text = page_to_summarize.markdown.raw_markdown
-    page_url = page_to_summarize.url # Use the actual URL from the crawl result
-    
-    # Summarize the content
-    summarizer = ContentSummarizer() 
+    # Only the crawl + Gemini part is rate limited; cache hits above never wait
+    async with SUMMARY_SEM:
+        crawl_results = []
+        try:
+            crawl_results = await crawler.crawl(target_url, crawler_context=crawler_context)
+        except Exception as e:
+            print(f"Error during crawling {target_url}: {e}")
+            return {"status": "error", "source": "crawler", "message": f"Crawling failed for {target_url}. Error: {str(e)}"}
 
-    if not summarizer.api_key_configured:
-        return {"status": "error", "source": "summarizer_config", "message": "Summarizer not configured. Please check GEMINI_KEY in configs.py."}
+        if not crawl_results:
+            return {"status": "error", "source": "crawler", "message": f"No content retrieved from crawling {target_url}. The URL might be invalid, inaccessible, or have no scrapable content."}
 
-    max_chars_for_api_call = 32000  
-    if len(markdown_text) > max_chars_for_api_call:
+        page_to_summarize = crawl_results[0]
 
-        print(f"Warning (API): Markdown content from {page_url} is long ({len(markdown_text)} chars). Truncating to {max_chars_for_api_call} characters for summary API call.")
-        markdown_text_for_summary = markdown_text[:max_chars_for_api_call]
-    else:
-        markdown_text_for_summary = markdown_text
+        if not (hasattr(page_to_summarize, 'markdown') and \
+                hasattr(page_to_summarize.markdown, 'raw_markdown') and \
+                page_to_summarize.markdown.raw_markdown and \
+                page_to_summarize.markdown.raw_markdown.strip()): # Check if markdown is not just whitespace
+            return {"status": "error", "source": "crawler", "message": "Crawled page has no meaningful markdown content to summarize."}
+        
+        markdown_text = page_to_summarize.markdown.raw_markdown
+        page_url = page_to_summarize.url # Use the actual URL from the crawl result
+
+        # Same content already summarized under another URL
+        digest = content_digest(markdown_text)
+        cached = await summary_cache.get_by_digest(digest)
+        if cached is not None:
+            result = {**cached["summary_json"], "crawled_url": page_url}
+            await summary_cache.put([target_url, page_url], digest, result)
+            return {**result, "cache": "hit"}
+
+        if _is_low_content(markdown_text):
+            print(f"FastAPI: Skipping summary for {page_url}, markdown has too little content ({len(markdown_text)} chars).")
+            result = {
+                "status": "success",
+                "data": [],
+                "skipped": "low_content",
+                "crawled_url": page_url,
+                "original_markdown_length": len(markdown_text),
+                "summarized_markdown_length": 0
+            }
+            await summary_cache.put([target_url, page_url], digest, result)
+            return result
     
-    json_summary = None
-    try:
-        json_summary = await summarizer.generate_json_summary(markdown_text_for_summary, page_url)
-    except Exception as e:
+        # Summarize the content
+        summarizer = get_summarizer()
+
+        if not summarizer.api_key_configured:
+            return {"status": "error", "source": "summarizer_config", "message": "Summarizer not configured. Please check GEMINI_KEY in configs.py."}
 
-        print(f"Error during summary generation for {page_url}: {e}")
-        return {"status": "error", "source": "summarizer_generation", "message": f"Summary generation failed. Error: {str(e)}"}
+        markdown_text_for_summary = await summarizer.truncate_to_token_budget(markdown_text)
+        if len(markdown_text_for_summary) < len(markdown_text):
+            print(f"Warning (API): Markdown content from {page_url} is long ({len(markdown_text)} chars). Truncated to {len(markdown_text_for_summary)} characters to fit the token budget for the summary API call.")
+    
+        json_summary = []
+        try:
+            async for module in summarizer.stream_json_summary(markdown_text_for_summary, page_url, digest):
+                json_summary.append(module)
+                if on_module is not None:
+                    on_module(module)
+        except orjson.JSONDecodeError:
+            # Summarizer's stream_json_summary prints detailed errors to server logs.
+            return {"status": "error", "source": "summarizer_output", "message": "Failed to generate or parse JSON summary. Check server logs for more details from the Summarizer."}
+        except Exception as e:
+            print(f"Error during summary generation for {page_url}: {e}")
+            return {"status": "error", "source": "summarizer_generation", "message": f"Summary generation failed. Error: {str(e)}"}
 
-    if json_summary is not None:
-        return {
+        result = {
             "status": "success",
             "data": json_summary,
             "crawled_url": page_url,
             "original_markdown_length": len(markdown_text),
             "summarized_markdown_length": len(markdown_text_for_summary)
         }
-    else:
-        # Summarizer's generate_json_summary prints detailed errors to server logs.
-        return {"status": "error", "source": "summarizer_output", "message": "Failed to generate or parse JSON summary. Check server logs for more details from the Summarizer."}
+        await summary_cache.put([target_url, page_url], digest, result)
+        return result
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts a single AsyncWebCrawler for the lifetime of the app so every request
+    reuses the same browser instead of launching a new one. The summarizer is
+    built here too so the first request doesn't pay for the Gemini setup, and its
+    shared Gemini connection is closed on shutdown.
+    """
+    summarizer = get_summarizer()
+    async with AsyncWebCrawler() as crawler_ctx:
+        app.state.crawler_ctx = crawler_ctx
+        yield
+    await summarizer.aclose()
+    await summary_cache.aclose()
 
 # FastAPI App Definition
 app = FastAPI(
     title="Web Content Summarizer API",
     description="API to crawl a webpage and generate a structured JSON summary.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Upper bound on URLs from one batch request being processed at the same time
+BATCH_CONCURRENCY = 10
+# Upper bound on URLs accepted in one batch request
+MAX_BATCH_URLS = 50
+
 class URLRequest(BaseModel):
     url: str
 
+class URLBatchRequest(BaseModel):
+    urls: list[str]
+
+def _validate_url(target_url: str):
+    """
+    Returns an error message if target_url can't be summarized, otherwise None.
+    """
+    if not target_url or not target_url.strip():
+        return "URL must be provided."
+    invalid_message = "Invalid URL format. Must start with http:// or https:// and include a host"
+    try:
+        parts = urlsplit(target_url.strip())
+        parts.port # raises for a non-numeric or out-of-range port
+    except ValueError: # e.g. an unbalanced IPv6 bracket in the host or a bad port
+        return invalid_message
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return invalid_message
+    return None
+
 @app.post("/summarize/")
-async def api_summarize_url(request: URLRequest):
+async def api_summarize_url(request: URLRequest, http_request: Request):
     """
     API endpoint to crawl a URL and return a structured JSON summary.
     """
     target_url = request.url
-    if not target_url:
-        raise HTTPException(status_code=400, detail="URL must be provided.")
-    
-    # validate URL 
-    if not (target_url.startswith("http://") or target_url.startswith("https://")):
-        raise HTTPException(status_code=400, detail="Invalid URL format. Must start with http:// or https://")
+    error_message = _validate_url(target_url)
+    if error_message:
+        raise HTTPException(status_code=400, detail=error_message)
+    target_url = normalize_url(target_url)
 
     print(f"FastAPI: Received request to summarize URL: {target_url}") # Server log
-    result = await process_url_and_summarize(target_url)
+    result = await process_url_and_summarize(target_url, http_request.app.state.crawler_ctx)
     
     if result["status"] == "success":
         return result
@@ -111,4 +248,80 @@ async def api_summarize_url(request: URLRequest):
             status_code = 503 # Service unavailable (config issue)
         else:
             status_code = 500 # Internal server error for other cases
-        raise HTTPException(status_code=status_code, detail=error_detail_dict)
\ No newline at end of file
+        raise HTTPException(status_code=status_code, detail=error_detail_dict)
+
+@app.post("/summarize/batch")
+async def api_summarize_batch(request: URLBatchRequest, http_request: Request):
+    """
+    API endpoint to summarize several URLs in one call.
+    Returns one result per URL in request order; a failing URL is reported in its own
+    result instead of failing the whole batch.
+    """
+    if not request.urls:
+        raise HTTPException(status_code=400, detail="At least one URL must be provided.")
+    if len(request.urls) > MAX_BATCH_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_URLS} URLs can be summarized per batch request.")
+
+    crawler_ctx = http_request.app.state.crawler_ctx
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def summarize_one(target_url: str):
+        error_message = _validate_url(target_url)
+        if error_message:
+            return {"status": "error", "source": "input_validation", "message": error_message}
+        try:
+            async with semaphore:
+                return await process_url_and_summarize(normalize_url(target_url), crawler_ctx)
+        except Exception as e:
+            print(f"FastAPI: Error processing {target_url} in batch: {e}")
+            return {"status": "error", "source": "unknown_backend_source", "message": f"Processing failed for {target_url}. Error: {str(e)}"}
+
+    print(f"FastAPI: Received request to summarize {len(request.urls)} URLs") # Server log
+    return await asyncio.gather(*(summarize_one(url) for url in request.urls))
+
+@app.post("/summarize/stream")
+async def api_summarize_stream(request: URLRequest, http_request: Request):
+    """
+    Streaming variant of /summarize/ returning NDJSON. Every line is tagged with "type":
+    {"type": "module", "module": ...} for each module as soon as Gemini has produced it,
+    then one {"type": "result", "result": ...} shaped like the /summarize/ response without "data".
+    Only URL validation errors get a 400; every pipeline error (crawl failure, no content,
+    missing API key, generation failure) arrives in the result line of a 200 response,
+    because the status code is sent before the pipeline runs.
+    """
+    target_url = request.url
+    error_message = _validate_url(target_url)
+    if error_message:
+        raise HTTPException(status_code=400, detail=error_message)
+    target_url = normalize_url(target_url)
+    crawler_ctx = http_request.app.state.crawler_ctx
+
+    async def ndjson_lines():
+        # The pipeline runs in its own task and hands modules over through an unbounded queue,
+        # so its SUMMARY_SEM slot is released as soon as Gemini is done, however slowly the client reads.
+        # Going through process_url_and_summarize shares the pipeline with concurrent requests for the same URL.
+        queue = asyncio.Queue()
+        task = asyncio.create_task(process_url_and_summarize(target_url, crawler_ctx, on_module=queue.put_nowait))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            streamed = False
+            while (module := await queue.get()) is not None:
+                streamed = True
+                yield orjson.dumps({"type": "module", "module": module}) + b"\n"
+            try:
+                result = task.result()
+            except Exception as e:
+                print(f"FastAPI: Error streaming summary of {target_url}: {e}")
+                result = {"status": "error", "source": "unknown_backend_source", "message": f"Processing failed for {target_url}. Error: {str(e)}"}
+            # Cached results and results shared with another request arrive in one piece; replay their modules first
+            if result["status"] == "success" and not streamed:
+                for module in result["data"]:
+                    yield orjson.dumps({"type": "module", "module": module}) + b"\n"
+            status = {key: value for key, value in result.items() if key != "data"}
+            yield orjson.dumps({"type": "result", "result": status}) + b"\n"
+        finally:
+            # No-op once the pipeline has finished; stops it if the client went away early
+            task.cancel()
+
+    print(f"FastAPI: Received request to stream summary of URL: {target_url}") # Server log
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
@@ -0,0 +1,125 @@
+import time
+from urllib.parse import urlsplit, urlunsplit
+import orjson
+import redis.asyncio as redis
+import xxhash
+from cachetools import TTLCache
+
+try:
+    import configs
+    REDIS_URL = getattr(configs, 'REDIS_URL', None)
+except ImportError:
+    REDIS_URL = None
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL used as a cache key: fragment dropped,
+    scheme and host lower-cased, empty path written as "/".
+    """
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+def content_digest(markdown_text: str) -> str:
+    """
+    Digest of the crawled markdown, used to recognise identical content served under different URLs.
+    xxh3 is non-cryptographic but far faster than hashlib digests, and 128 bits keeps collisions negligible.
+    """
+    return xxhash.xxh3_128_hexdigest(markdown_text.encode("utf-8"))
+
+
+def _make_entry(result: dict, digest: str) -> dict:
+    return {
+        "url": result.get("crawled_url"),
+        "digest": digest,
+        "summary_json": result,
+        "timestamp": time.time()
+    }
+
+
+class SummaryCache:
+    """
+    Two-tier in-process cache of successful summary results.
+    Entries are looked up by normalized URL first and, once a page has been crawled,
+    by the digest of its markdown so the Gemini call can be skipped for duplicate content.
+    """
+    def __init__(self, maxsize: int = 512, ttl: int = 3600):
+        self._by_url = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._by_digest = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get_by_url(self, url: str):
+        return self._by_url.get(normalize_url(url))
+
+    async def get_by_digest(self, digest: str):
+        return self._by_digest.get(digest)
+
+    async def put(self, urls, digest: str, result: dict):
+        """
+        Stores a result under every URL it was reached by and under its content digest.
+        """
+        entry = _make_entry(result, digest)
+        for url in urls:
+            self._by_url[normalize_url(url)] = entry
+        self._by_digest[digest] = entry
+        return entry
+
+    async def aclose(self):
+        pass
+
+
+class RedisSummaryCache:
+    """
+    Same interface as SummaryCache, backed by Redis so every worker process shares hits.
+    Redis errors are logged and treated as cache misses; the cache never fails a request.
+    """
+    def __init__(self, redis_url: str, ttl: int = 3600, prefix: str = "web2module:summary"):
+        # Short timeouts so an unreachable Redis costs a request half a second, not a TCP timeout
+        self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._ttl = ttl
+        self._prefix = prefix
+
+    async def _get(self, key: str):
+        try:
+            raw = await self._redis.get(key)
+            return orjson.loads(raw) if raw is not None else None
+        except redis.RedisError as e:
+            print(f"Warning (Cache): Redis lookup failed for {key}: {e}")
+        except orjson.JSONDecodeError as e:
+            print(f"Warning (Cache): Ignoring undecodable cache entry {key}: {e}")
+        return None
+
+    async def get_by_url(self, url: str):
+        return await self._get(f"{self._prefix}:url:{normalize_url(url)}")
+
+    async def get_by_digest(self, digest: str):
+        return await self._get(f"{self._prefix}:digest:{digest}")
+
+    async def put(self, urls, digest: str, result: dict):
+        """
+        Stores a result under every URL it was reached by and under its content digest.
+        """
+        entry = _make_entry(result, digest)
+        payload = orjson.dumps(entry)
+        keys = {f"{self._prefix}:url:{normalize_url(url)}" for url in urls}
+        keys.add(f"{self._prefix}:digest:{digest}")
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.set(key, payload, ex=self._ttl)
+                await pipe.execute()
+        except redis.RedisError as e:
+            print(f"Warning (Cache): Redis store failed for {entry['url']}: {e}")
+        return entry
+
+    async def aclose(self):
+        await self._redis.aclose()
+
+
+def make_summary_cache():
+    """
+    Returns a Redis-backed cache when REDIS_URL is set in configs.py, otherwise an in-process one.
+    """
+    if REDIS_URL:
+        return RedisSummaryCache(REDIS_URL)
+    return SummaryCache()
@@ -1 +1,3 @@
-GEMINI_KEY = 'YOUR_GEMINI_API_KEY'
\ No newline at end of file
+GEMINI_KEY = 'YOUR_GEMINI_API_KEY'
+# Optional, e.g. 'redis://localhost:6379/0'. Shares the summary cache between worker processes.
+REDIS_URL = None
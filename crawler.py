@@ -1,7 +1,74 @@
 import asyncio
+from urllib.parse import urljoin, urlsplit
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
 from crawl4ai.deep_crawling import BFSDeepCrawlStrategy
-from crawl4ai.content_scraping_strategy import LXMLWebScrapingStrategy
+from crawl4ai.content_scraping_strategy import ContentScrapingStrategy, LXMLWebScrapingStrategy
+from crawl4ai.models import Link, Links, ScrapingResult
+from crawl4ai.utils import get_base_domain, is_external_url
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+# Tags that never carry readable content
+_NON_CONTENT_TAGS = ["script", "style", "noscript", "iframe", "svg", "canvas", "template"]
+
+
+class SelectolaxScrapingStrategy(ContentScrapingStrategy):
+    """
+    Scraping strategy built on selectolax's Lexbor parser, which parses large pages
+    several times faster than lxml. It only does what this project needs from the
+    scraping step: drop non-content tags, hand the cleaned body HTML to crawl4ai's
+    markdown generator and collect links for deep crawling.
+    """
+    def __init__(self, logger=None):
+        self.logger = logger
+
+    def scrap(self, url: str, html: str, **kwargs) -> ScrapingResult:
+        url = kwargs.get("redirected_url") or url
+        tree = HTMLParser(html)
+
+        title_node = tree.css_first("title")
+        description_node = tree.css_first('meta[name="description"]')
+        metadata = {
+            "title": title_node.text(strip=True) if title_node else None,
+            "description": description_node.attributes.get("content") if description_node else None
+        }
+
+        tree.strip_tags(_NON_CONTENT_TAGS)
+        root = tree.body or tree.root
+        if root is None:
+            return ScrapingResult(cleaned_html="", success=False)
+
+        base_domain = get_base_domain(url)
+        internal_links, external_links, seen = [], [], set()
+        for node in root.css("a[href]"):
+            href = urljoin(url, (node.attributes.get("href") or "").strip())
+            if urlsplit(href).scheme not in ("http", "https") or href in seen:
+                continue
+            seen.add(href)
+            link = Link(
+                href=href,
+                text=node.text(strip=True),
+                title=node.attributes.get("title") or "",
+                base_domain=get_base_domain(href)
+            )
+            if is_external_url(href, base_domain):
+                external_links.append(link)
+            else:
+                internal_links.append(link)
+
+        return ScrapingResult(
+            cleaned_html=root.html,
+            success=True,
+            links=Links(internal=internal_links, external=external_links),
+            metadata=metadata
+        )
+
+    async def ascrap(self, url: str, html: str, **kwargs) -> ScrapingResult:
+        return await asyncio.to_thread(self.scrap, url, html, **kwargs)
+
 
 class WebCrawler:
     """
@@ -19,11 +86,15 @@ class WebCrawler:
         self.include_external = include_external
         self.max_pages = max_pages
         self.verbose = verbose
+        # selectolax is much faster on large pages; lxml is kept as a fallback when it isn't installed
+        self.scraping_strategy = SelectolaxScrapingStrategy() if HTMLParser is not None else LXMLWebScrapingStrategy()
         # Removed the print from __init__ for cleaner library use
 
-    async def crawl(self, start_url: str):
+    async def crawl(self, start_url: str, crawler_context: AsyncWebCrawler = None):
         """
         Starts the web crawling process for the given start_url.
+        If an already started AsyncWebCrawler is passed as crawler_context it is reused,
+        otherwise a short-lived one is opened for this call only.
         """
         if not start_url or not start_url.strip():
             print("Error (Crawler): A valid start_url must be provided.")
@@ -35,13 +106,16 @@ class WebCrawler:
                 include_external=self.include_external,
                 max_pages=self.max_pages,
             ),
-            scraping_strategy=LXMLWebScrapingStrategy(),
+            scraping_strategy=self.scraping_strategy,
             verbose=self.verbose
         )
         results = []
         try:
-            async with AsyncWebCrawler() as crawler_context:
+            if crawler_context is not None:
                 results = await crawler_context.arun(start_url, config=config)
+            else:
+                async with AsyncWebCrawler() as own_context:
+                    results = await own_context.arun(start_url, config=config)
         except Exception as e:
             print(f"Error (Crawler): An error occurred during crawling {start_url}: {e}")
         
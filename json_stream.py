@@ -0,0 +1,113 @@
+import re
+import orjson
+
+# Optional ```json ... ``` fence Gemini sometimes wraps its output in
+FENCE_RE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+
+# Output made only of these characters so far could still turn into a fenced or bare array
+_UNDECIDED_RE = re.compile(r"[\s`json]*")
+_ARRAY_START_RE = re.compile(r"\s*(?:```(?:json)?\s*)?\[")
+# What may follow the closing bracket of the array
+_ARRAY_END_RE = re.compile(r"\s*(?:```\s*)?")
+# A complete string, a lone quote (string not complete yet) or a structural character
+_TOKEN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|["\[\]{},]', re.DOTALL)
+
+
+class JSONArrayStream:
+    """
+    Splits a streamed top-level JSON array into its elements, so each module can be
+    decoded as soon as it is complete instead of after the whole response.
+    Only strings and structural characters are visited (found with one regex), so feeding stays cheap
+    enough to run on the event loop. Output that isn't a top-level array is decoded
+    whole by close().
+    """
+    def __init__(self):
+        self.text = "" # Everything received so far, also used for error logging
+        self.produced = 0 # Number of elements returned by feed()
+        self._pos = 0 # Next character to scan
+        self._started = False
+        self._not_array = False
+        self._closed = False
+        self._depth = 0
+        self._element_start = 0
+
+    def feed(self, chunk: str) -> list:
+        """
+        Adds a chunk of streamed text and returns the array elements completed by it.
+        """
+        self.text += chunk
+        if self._not_array or self._closed:
+            return []
+        text = self.text
+
+        if not self._started:
+            if _UNDECIDED_RE.fullmatch(text):
+                return []
+            start_match = _ARRAY_START_RE.match(text)
+            if not start_match:
+                self._not_array = True
+                return []
+            self._started = True
+            self._depth = 1
+            self._pos = self._element_start = start_match.end()
+
+        items = []
+        pos = self._pos
+        while True:
+            match = _TOKEN_RE.search(text, pos)
+            if match is None:
+                pos = len(text)
+                break
+            token, i = match.group(), match.start()
+            if token[0] == '"':
+                if len(token) == 1:
+                    # The string isn't complete yet; rescan it from its opening quote next time
+                    pos = i
+                    break
+                pos = match.end()
+                continue
+            ch = token
+            pos = i + 1
+            if ch in "[{":
+                self._depth += 1
+                continue
+            if self._depth > 1:
+                if ch != ",":
+                    self._depth -= 1
+                continue
+            if ch == "}":
+                continue # Unbalanced; left for close() to report
+            # A separator or the closing bracket of the top-level array ends an element
+            element = text[self._element_start:i].strip()
+            if element:
+                items.append(orjson.loads(element))
+            self._element_start = pos
+            if ch == "]":
+                self._closed = True
+                break
+        self._pos = pos
+        self.produced += len(items)
+        return items
+
+    @property
+    def finished(self) -> bool:
+        """
+        True once a non-empty top-level array has been closed with nothing but an optional fence after it,
+        i.e. when close() has nothing left to parse.
+        """
+        return self._closed and self.produced > 0 and _ARRAY_END_RE.fullmatch(self.text, self._pos) is not None
+
+    def close(self) -> list:
+        """
+        Returns what is left once the stream has ended. After a cleanly closed array that
+        is nothing; otherwise the whole output is parsed at once (a single value is wrapped
+        in a list) and only elements not returned by feed() are given back.
+        Raises orjson.JSONDecodeError for invalid or truncated output.
+        """
+        if self.finished:
+            return []
+        fence_match = FENCE_RE.match(self.text)
+        parsed_json = orjson.loads(fence_match.group(1) if fence_match else self.text)
+        if not isinstance(parsed_json, list):
+            return [parsed_json]
+        return parsed_json[self.produced:]
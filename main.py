@@ -1,10 +1,21 @@
 import streamlit as st
-import requests
+import httpx
 import json 
 
 
 
-STREAMLIT_API_ENDPOINT_URL = "http://127.0.0.1:8000/summarize/" 
+# Streaming endpoint: modules arrive as NDJSON lines while Gemini is still generating
+STREAMLIT_API_ENDPOINT_URL = "http://127.0.0.1:8000/summarize/stream" 
+
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    """
+    One keep-alive HTTP client per Streamlit server, so repeated clicks reuse the
+    connection to the backend instead of opening a new one each time.
+    cache_resource is needed because Streamlit re-executes this script on every interaction.
+    """
+    # Increased timeout for potentially long processing
+    return httpx.Client(http2=True, timeout=180, limits=httpx.Limits(max_keepalive_connections=4))
 
 def run_streamlit_app():
     st.set_page_config(layout="wide", page_title="Web Content Summarizer", page_icon="🌐")
@@ -59,51 +70,64 @@ def run_streamlit_app():
             with st.spinner("🤖 Agent at work... Contacting backend for crawling and summarizing. This might take a few moments..."):
                 try:
                     payload = {"url": url_input}
-                    # Increased timeout for potentially long processing
-                    response = requests.post(STREAMLIT_API_ENDPOINT_URL, json=payload, timeout=180) 
+                    with get_http_client().stream("POST", STREAMLIT_API_ENDPOINT_URL, json=payload) as response:
+                        if response.status_code == 200:
+                            summary_header = st.empty()
+                            modules_placeholder = st.empty()
+                            modules = []
+                            result = {}
+                            for line in response.iter_lines():
+                                if not line:
+                                    continue
+                                item = json.loads(line)
+                                if item.get("type") == "module":
+                                    modules.append(item["module"])
+                                    modules_placeholder.json(modules)
+                                elif item.get("type") == "result": # Final status line
+                                    result = item["result"]
 
-                    if response.status_code == 200:
-                        result = response.json() 
-                        if result.get("status") == "success":
-                            st.balloons()
-                            st.subheader(f"✅ Summary for: {result.get('crawled_url', url_input)}")
-                            
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.metric("Original Markdown Length (chars)", result.get('original_markdown_length', 'N/A'))
-                            with col2:
-                                st.metric("Summarized Markdown Length (chars)", result.get('summarized_markdown_length', 'N/A'))
-                            
-                            st.info("Below is the structured JSON summary of the web content:")
-                            st.json(result.get("data", {}))
+                            if result.get("status") == "success":
+                                st.balloons()
+                                with summary_header.container():
+                                    st.subheader(f"✅ Summary for: {result.get('crawled_url', url_input)}")
+                                    
+                                    col1, col2 = st.columns(2)
+                                    with col1:
+                                        st.metric("Original Markdown Length (chars)", result.get('original_markdown_length', 'N/A'))
+                                    with col2:
+                                        st.metric("Summarized Markdown Length (chars)", result.get('summarized_markdown_length', 'N/A'))
+                                    
+                                    st.info("Below is the structured JSON summary of the web content:")
+                                modules_placeholder.json(modules)
+                            else:
+                                st.error(f"😥 API reported an issue: {result.get('message', 'Unknown error from API payload.')}")
+                                if 'detail' in result: 
+                                    st.json(result['detail'])
                         else:
-                            st.error(f"😥 API reported an issue: {result.get('message', 'Unknown error from API payload.')}")
-                            if 'detail' in result: 
-                                st.json(result['detail'])
-                    else:
-                        error_details_str = f"Status Code: {response.status_code}"
-                        try:
-                            api_error_data = response.json() 
-                            error_detail = api_error_data.get("detail", "No specific error detail from API.")
+                            response.read()
+                            error_details_str = f"Status Code: {response.status_code}"
+                            try:
+                                api_error_data = response.json() 
+                                error_detail = api_error_data.get("detail", "No specific error detail from API.")
                             
-                            if isinstance(error_detail, dict): 
-                                message = error_detail.get("message", "Unknown error.")
-                                source = error_detail.get("source", "N/A")
-                                error_details_str += f" - Message: {message} (Source: {source})"
-                            elif isinstance(error_detail, str): 
-                                error_details_str += f" - Detail: {error_detail}"
-                            else: # Fallback
-                                error_details_str += f" - Response: {response.text[:500]}"
+                                if isinstance(error_detail, dict): 
+                                    message = error_detail.get("message", "Unknown error.")
+                                    source = error_detail.get("source", "N/A")
+                                    error_details_str += f" - Message: {message} (Source: {source})"
+                                elif isinstance(error_detail, str): 
+                                    error_details_str += f" - Detail: {error_detail}"
+                                else: # Fallback
+                                    error_details_str += f" - Response: {response.text[:500]}"
 
-                        except json.JSONDecodeError:
-                            error_details_str += f" - Response: {response.text[:500]}" 
-                        st.error(f"🚫 Failed to process URL. {error_details_str}")
+                            except json.JSONDecodeError:
+                                error_details_str += f" - Response: {response.text[:500]}" 
+                            st.error(f"🚫 Failed to process URL. {error_details_str}")
 
-                except requests.exceptions.Timeout:
+                except httpx.TimeoutException:
                     st.error(f"⏳ Network Error: The request to the backend API at `{STREAMLIT_API_ENDPOINT_URL}` timed out. The server might be busy, the URL could be very slow to process, or the timeout is too short.")
-                except requests.exceptions.ConnectionError:
+                except httpx.ConnectError:
                     st.error(f"🔌 Network Error: Could not connect to the backend API at `{STREAMLIT_API_ENDPOINT_URL}`. Please ensure the FastAPI server (app.py) is running and accessible.")
-                except requests.exceptions.RequestException as e:
+                except httpx.HTTPError as e:
                     st.error(f"📡 Network or API Error: An unexpected error occurred while communicating with the backend. Details: {e}")
                 except Exception as e: 
                     st.error(f"🤯 An unexpected application error occurred in the UI: {e}")
@@ -1,8 +1,12 @@
 import asyncio
-import json
+import random
+import orjson
 import google.generativeai as genai
+from cachetools import LRUCache
+from google.api_core import exceptions as google_exceptions
 
 from crawler import WebCrawler 
+from json_stream import JSONArrayStream
 
 try:
     import configs
@@ -16,31 +20,36 @@ except ImportError:
     GEMINI_API_KEY = None
 
 
-class ContentSummarizer:
-    def __init__(self):
-        self.model = None
-        self.api_key_configured = False
-
-        if GEMINI_API_KEY:
-            try:
-                genai.configure(api_key=GEMINI_API_KEY)
-                # Using gemini-2.0-flash-001 
-                self.model = genai.GenerativeModel(
-                    model_name='gemini-2.0-flash-001', 
-                    generation_config={"response_mime_type": "application/json"}
-                )
-                self.api_key_configured = True
-                print("ContentSummarizer initialized with Gemini model (gemini-1.5-flash-latest).")
-            except Exception as e:
-                print(f"Error (Summarizer): Failed to initialize Gemini model: {e}")
-        else:
-            print("Warning (Summarizer): Gemini API key not configured. Summarizer will not function.")
-
-    def _build_prompt(self, markdown_content: str, url: str) -> str:
-        
-        prompt = f"""
+# Recently built prompts keyed by (url, markdown digest, markdown length). Successful summaries
+# are already answered by the digest cache in app.py, so this mainly helps retries after a failed
+# generation; kept small since each prompt holds the whole markdown. Only touched from the event loop thread.
+_PROMPT_CACHE = LRUCache(maxsize=16)
+
+# Rate-limit and transient server errors from Gemini that are worth retrying
+_RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+GENERATION_MAX_ATTEMPTS = 4
+_RETRY_BASE_DELAY = 1.0 # seconds, doubled on every retry
+
+# Token budget for the crawled markdown, leaving room for the prompt instructions
+MAX_MARKDOWN_TOKENS = 28000
+# Used when the token count can't be obtained
+MAX_MARKDOWN_CHARS_FALLBACK = 32000
+_MAX_TRUNCATION_ROUNDS = 3
+# With byte fallback a rare character can cost one token per UTF-8 byte, so at most 4
+_MAX_TOKENS_PER_CHAR = 4
+
+# The instructions are static; only the URL and the crawled markdown change per request,
+# so the template is split once at import time around those two slots.
+_PROMPT_HEAD = """
         Context
-        You are provided with content from a documentation or help page accessible via a URL: {url}. Your task is to thoroughly analyze this content and restructure it into a well-organized JSON format that clearly identifies the modules and submodules of the product/service being documented.
+        You are provided with content from a documentation or help page accessible via a URL: """
+
+_PROMPT_BODY = """. Your task is to thoroughly analyze this content and restructure it into a well-organized JSON format that clearly identifies the modules and submodules of the product/service being documented.
         Definitions
         Module: A major functional component or section of the product that typically encompasses multiple related features or capabilities. Modules are managed by product managers and represent distinct areas of functionality.
         Submodule: A specific feature, capability, or process that belongs to a module. Submodules typically perform specific tasks or provide specific functionality within the larger context of their parent module.
@@ -64,29 +73,31 @@ class ContentSummarizer:
 
         Here I have provided you the web crawled content in markdown format:
         ---
-        {markdown_content}
+        """
+
+_PROMPT_TAIL = """
         ---
 
         Structure your output in the following JSON format (a list of module objects):
         ```json
         [
-          {{  // Escaped brace
+          {  // Escaped brace
             "module": "Module_Name",
             "Description": "Detailed description of the module, including its overall purpose and functionality",
-            "Submodules": {{ // Escaped brace
+            "Submodules": { // Escaped brace
               "Submodule_Name_1": "Detailed description of the first submodule's functionality",
               "Submodule_Name_2": "Detailed description of the second submodule's functionality",
               "Submodule_Name_3": "Detailed description of the third submodule's functionality"
-            }} // Escaped brace
-          }}, // Escaped brace
-          {{ // Escaped brace
+            } // Escaped brace
+          }, // Escaped brace
+          { // Escaped brace
             "module": "Another_Module_Name",
             "Description": "Detailed description of this module",
-            "Submodules": {{ // Escaped brace
+            "Submodules": { // Escaped brace
               "Submodule_Name_1": "Detailed description of this submodule",
               "Submodule_Name_2": "Detailed description of this submodule"
-            }} // Escaped brace
-          }} // Escaped brace
+            } // Escaped brace
+          } // Escaped brace
         ]
         ```
 
@@ -97,7 +108,7 @@ class ContentSummarizer:
         Be detailed - provide thorough descriptions that clearly explain what each module and submodule does
         Maintain consistent formatting according to the specified JSON structure
         Ensure your descriptions are factual and based solely on the provided documentation
-        If a module has no clear submodules, include an empty object for the "Submodules" field: "Submodules": {{}}
+        If a module has no clear submodules, include an empty object for the "Submodules" field: "Submodules": {}
         If the documentation structure isn't clear, make your best judgment to organize the content into logical modules and submodules
 
         *Additional Notes*
@@ -106,43 +117,137 @@ class ContentSummarizer:
         Ensure all JSON syntax is valid and properly formatted
         Use descriptive names for modules and submodules that would make sense to product managers and developers
         Descriptions should be comprehensive enough to understand the purpose without being excessively verbose."""
+
+
+class ContentSummarizer:
+    def __init__(self):
+        self.model = None
+        self.api_key_configured = False
+
+        if GEMINI_API_KEY:
+            try:
+                genai.configure(api_key=GEMINI_API_KEY)
+                # Using gemini-2.0-flash-001 
+                self.model = genai.GenerativeModel(
+                    model_name='gemini-2.0-flash-001', 
+                    generation_config={"response_mime_type": "application/json"}
+                )
+                self.api_key_configured = True
+                print("ContentSummarizer initialized with Gemini model (gemini-1.5-flash-latest).")
+            except Exception as e:
+                print(f"Error (Summarizer): Failed to initialize Gemini model: {e}")
+        else:
+            print("Warning (Summarizer): Gemini API key not configured. Summarizer will not function.")
+
+    async def aclose(self):
+        """
+        Closes the gRPC channel the model reuses for all async Gemini calls.
+        google.generativeai creates that client lazily on the first call and keeps it for the process.
+        """
+        async_client = getattr(self.model, "_async_client", None)
+        if async_client is not None:
+            await async_client.transport.close()
+
+    def _build_prompt(self, markdown_content: str, url: str) -> str:
+        return f"{_PROMPT_HEAD}{url}{_PROMPT_BODY}{markdown_content}{_PROMPT_TAIL}"
+
+    async def truncate_to_token_budget(self, markdown_content: str, max_tokens: int = MAX_MARKDOWN_TOKENS) -> str:
+        """
+        Returns the longest prefix of markdown_content that fits in max_tokens of the model's tokenizer.
+        Slicing the str (not its encoded bytes) means a UTF-8 sequence is never split.
+        """
+        # Content this short can't exceed the budget even at the worst-case tokens per character
+        if len(markdown_content) <= max_tokens // _MAX_TOKENS_PER_CHAR:
+            return markdown_content
+
+        try:
+            total_tokens = (await self.model.count_tokens_async(markdown_content)).total_tokens
+            if total_tokens <= max_tokens:
+                return markdown_content
+
+            # Start from the proportional estimate and shrink until the prefix fits
+            cut = len(markdown_content) * max_tokens // total_tokens
+            for _ in range(_MAX_TRUNCATION_ROUNDS):
+                prefix_tokens = (await self.model.count_tokens_async(markdown_content[:cut])).total_tokens
+                if prefix_tokens <= max_tokens:
+                    return markdown_content[:cut]
+                cut = int(cut * max_tokens / prefix_tokens * 0.98)
+            # Still over budget after every round; this prefix fits whatever its characters cost
+            return markdown_content[:max_tokens // _MAX_TOKENS_PER_CHAR]
+        except Exception as e:
+            print(f"Warning (Summarizer): Token count failed, truncating to {MAX_MARKDOWN_CHARS_FALLBACK} characters instead: {e}")
+            return markdown_content[:MAX_MARKDOWN_CHARS_FALLBACK]
+
+    def _get_prompt(self, markdown_content: str, url: str, markdown_digest: str = None) -> str:
+        # The length tells apart differently truncated versions of the same crawled page
+        prompt_key = (url, markdown_digest, len(markdown_content))
+        prompt = _PROMPT_CACHE.get(prompt_key) if markdown_digest else None
+        if prompt is None:
+            # A single string concatenation; a few microseconds even for the largest pages
+            prompt = self._build_prompt(markdown_content, url)
+            if markdown_digest:
+                _PROMPT_CACHE[prompt_key] = prompt
         return prompt
 
-    async def generate_json_summary(self, markdown_content: str, url: str):
+    async def _stream_completion(self, prompt: str):
+        """
+        Yields the text of each chunk as Gemini streams the completion.
+        Rate-limit and transient server errors are retried with exponential backoff
+        as long as nothing has been yielded yet.
+        """
+        for attempt in range(GENERATION_MAX_ATTEMPTS):
+            received = False
+            try:
+                response = await self.model.generate_content_async([prompt], stream=True)
+                if response.prompt_feedback.block_reason:
+                    raise ValueError(f"Prompt blocked, reason: {response.prompt_feedback.block_reason}")
+                async for chunk in response:
+                    received = True
+                    yield chunk.text
+                return
+            except _RETRYABLE_ERRORS as e:
+                if received or attempt == GENERATION_MAX_ATTEMPTS - 1:
+                    raise
+                delay = _RETRY_BASE_DELAY * 2 ** attempt + random.uniform(0, _RETRY_BASE_DELAY)
+                print(f"Warning (Summarizer): Gemini call failed ({e}), retrying in {delay:.1f}s (attempt {attempt + 1}/{GENERATION_MAX_ATTEMPTS}).")
+                await asyncio.sleep(delay)
+
+    async def stream_json_summary(self, markdown_content: str, url: str, markdown_digest: str = None):
+        """
+        Async generator yielding each module of the JSON summary as soon as Gemini has finished writing it.
+        Raises orjson.JSONDecodeError if the output turns out not to be valid JSON.
+        """
         if not self.api_key_configured or not self.model:
-            print("Error (Summarizer): Not configured with API key or model.")
-            return None 
-        
+            raise RuntimeError("Summarizer not configured with API key or model.")
+
         if not markdown_content or not markdown_content.strip():
             print("Warning (Summarizer): Markdown content is empty. Returning empty list for summary.")
-            return []
+            return
 
-        prompt = self._build_prompt(markdown_content, url)
-        
-        response_text_for_error_logging = "" # Initialize for error logging
+        prompt = self._get_prompt(markdown_content, url, markdown_digest)
+        parser = JSONArrayStream()
         try:
-            response = await self.model.generate_content_async([prompt])
-            response_text_for_error_logging = response.text # Store for potential error log
-            
-            json_response_text = response.text.strip()
-            
-            if json_response_text.startswith("```json"):
-                json_response_text = json_response_text[7:-3].strip()
-            elif json_response_text.startswith("```"):
-                 json_response_text = json_response_text[3:-3].strip()
-
-            parsed_json = json.loads(json_response_text)
-            return parsed_json
-        except json.JSONDecodeError as e:
+            async for text in self._stream_completion(prompt):
+                for module in parser.feed(text):
+                    yield module
+            # Output that wasn't a clean array is parsed whole; only that parse is moved off the event loop
+            remaining = parser.close() if parser.finished else await asyncio.to_thread(parser.close)
+            for module in remaining:
+                yield module
+        except orjson.JSONDecodeError as e:
             print(f"Error (Summarizer): Failed to decode JSON from Gemini response: {e}")
-            print(f"Problematic response text (first 1000 chars): {response_text_for_error_logging[:1000]}...")
-            return None
-        except Exception as e:
-            error_message = f"Error (Summarizer): During summary generation: {e}"
-            # Try to get more specific feedback if available from the response object
-            if 'response' in locals() and hasattr(response, 'prompt_feedback') and response.prompt_feedback.block_reason:
-                error_message += f" - Prompt blocked, reason: {response.prompt_feedback.block_reason}"
-            elif 'response' in locals() and not response.candidates:
-                 error_message += f" - No candidates in response. Finish reason: {response.prompt_feedback if hasattr(response, 'prompt_feedback') else 'N/A'}"
-            print(error_message)
-            return None
\ No newline at end of file
+            print(f"Problematic response text (first 1000 chars): {parser.text[:1000]}...")
+            raise
+
+
+_INSTANCE = None
+
+def get_summarizer() -> ContentSummarizer:
+    """
+    Returns the process-wide ContentSummarizer, building it on first use so
+    genai.configure and the GenerativeModel are only set up once.
+    """
+    global _INSTANCE
+    if _INSTANCE is None:
+        _INSTANCE = ContentSummarizer()
+    return _INSTANCE
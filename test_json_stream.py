@@ -0,0 +1,68 @@
+import orjson
+import pytest
+
+from json_stream import JSONArrayStream
+
+
+def _stream(text: str, chunk_size: int) -> list:
+    parser = JSONArrayStream()
+    items = []
+    for start in range(0, len(text), chunk_size):
+        items += parser.feed(text[start:start + chunk_size])
+    return items + parser.close()
+
+
+MODULES = [
+    {"module": "A [x] \"q\" {", "Description": "d, with comma", "Submodules": {"s": "t}]\\"}},
+    {"module": "B", "Description": "", "Submodules": {}}
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1000])
+def test_objects_split_at_any_chunk_size(chunk_size):
+    assert _stream(orjson.dumps(MODULES).decode(), chunk_size) == MODULES
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1000])
+def test_fenced_array(chunk_size):
+    text = "```json\n" + orjson.dumps(MODULES, option=orjson.OPT_INDENT_2).decode() + "\n```\n"
+    assert _stream(text, chunk_size) == MODULES
+
+
+def test_elements_are_returned_as_soon_as_complete():
+    parser = JSONArrayStream()
+    assert parser.feed('[{"module": "A"}, {"mod') == [{"module": "A"}]
+    assert not parser.finished
+    assert parser.feed('ule": "B"}]') == [{"module": "B"}]
+    assert parser.finished
+    assert parser.close() == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1000])
+def test_scalar_elements(chunk_size):
+    assert _stream('["a", "b,]", 1, null, [2, 3]]', chunk_size) == ["a", "b,]", 1, None, [2, 3]]
+
+
+def test_empty_array():
+    assert _stream("[]", 1) == []
+
+
+def test_single_object_is_wrapped():
+    assert _stream('{"module": "A"}', 3) == [{"module": "A"}]
+
+
+def test_prose_before_array_is_an_error():
+    with pytest.raises(orjson.JSONDecodeError):
+        _stream('Here: [1] then [{"module": "A"}]', 4)
+
+
+def test_trailing_content_after_array_is_an_error():
+    with pytest.raises(orjson.JSONDecodeError):
+        _stream('[1] then [{"module": "A"}]', 4)
+
+
+def test_truncated_array_is_an_error():
+    parser = JSONArrayStream()
+    assert parser.feed('[{"module": "A"}, {"module"') == [{"module": "A"}]
+    with pytest.raises(orjson.JSONDecodeError):
+        parser.close()